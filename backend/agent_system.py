@@ -1,80 +1,424 @@
 import google.generativeai as genai
+import dataclasses
+import enum
+import functools
+import heapq
+import logging
 import os
+import typing
 import json
 import re
+import string
+import numpy as np
+import orjson
 from dotenv import load_dotenv
+from llm_cache import PromptCache
 
+logger = logging.getLogger("terralink.agents")
+
+# Read .env once, before any TERRALINK_* settings below are resolved
 load_dotenv()
 
-class MultiAgentSystem:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in .env file!")
-        
-        genai.configure(api_key=api_key)
+# Flash-8B is plenty for the short structured JSON of Agents 1 and 5;
+# Agent 4's prose gets the larger Flash model. Override via env to re-tune.
+PARSER_MODEL = os.getenv('TERRALINK_PARSER_MODEL', 'gemini-1.5-flash-8b')
+NARRATIVE_MODEL = os.getenv('TERRALINK_NARRATIVE_MODEL', 'gemini-1.5-flash')
+
+# Cap every Gemini call so a hung connection falls back instead of blocking
+# the request; DeadlineExceeded lands in each agent's fallback branch
+GEMINI_TIMEOUT = float(os.getenv('TERRALINK_GEMINI_TIMEOUT', '10'))
+REQUEST_OPTIONS = {'timeout': GEMINI_TIMEOUT}
+
+# Generation settings for better JSON outputs, shared by every agent
+GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'top_p': 0.95,
+    'top_k': 40,
+    'max_output_tokens': 1024,
+}
+
+
+class EnergyType(enum.Enum):
+    SOLAR = 'solar'
+    WIND = 'wind'
+    HYDRO = 'hydro'
+    GEOTHERMAL = 'geothermal'
+
+
+class Criteria(typing.TypedDict):
+    primary: list[str]
+    secondary: list[str]
+
+
+class ParsedQuery(typing.TypedDict):
+    """Response schema for Agent 1"""
+    energy_type: EnergyType
+    region: typing.Optional[str]
+    size_acres: typing.Optional[float]
+    criteria: Criteria
+
+
+class Prediction(typing.TypedDict):
+    """Response schema for Agent 5"""
+    forecast_2025: str
+    forecast_2030: str
+    confidence_score: int
+    key_trends: list[str]
+    risk_factors: list[str]
+    opportunities: list[str]
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class SiteStats:
+    """The summary of a site list that Agent 5 actually reads; cheap to cache per region"""
+    num_sites: int
+    avg_score: float
+    top_scores: tuple[float, ...]
+    avg_irradiance: float
+    
+    @classmethod
+    def from_sites(cls, sites):
+        # One vectorized pass over the site dicts
+        stats = np.fromiter(
+            ((s.get('score', 0), s.get('irradiance', 0)) for s in sites),
+            dtype=_SITE_STATS_DTYPE,
+            count=len(sites)
+        )
         
-        # Use Gemini Pro model for agents
-        self.model = genai.GenerativeModel('gemini-pro')
+        # Top 10 without a full sort: a 10-item heap for typical sample counts,
+        # an O(n) partition once the array is large
+        if len(stats) > _PARTITION_THRESHOLD:
+            top_scores = np.sort(np.partition(stats['score'], -10)[-10:])[::-1].tolist()
+        else:
+            top_scores = heapq.nlargest(10, stats['score'].tolist())
         
-        # Configure generation settings for better JSON outputs
-        self.generation_config = {
-            'temperature': 0.7,
-            'top_p': 0.95,
-            'top_k': 40,
-            'max_output_tokens': 1024,
+        return cls(
+            num_sites=len(sites),
+            avg_score=float(stats['score'].mean()),
+            top_scores=tuple(top_scores),
+            avg_irradiance=float(stats['irradiance'].mean())
+        )
+
+
+# Constrained decoding: Gemini must answer with well-formed JSON.
+# Parsing runs greedy so identical queries give identical (cacheable) answers.
+PARSE_CONFIG = {
+    **GENERATION_CONFIG,
+    'temperature': 0.0,
+    'top_p': 1.0,
+    'response_mime_type': 'application/json',
+    'response_schema': ParsedQuery,
+}
+
+PARSE_BATCH_CONFIG = {
+    **PARSE_CONFIG,
+    'response_schema': list[ParsedQuery],
+}
+
+PREDICT_CONFIG = {
+    **GENERATION_CONFIG,
+    'response_mime_type': 'application/json',
+    'response_schema': Prediction,
+}
+
+# Rules and few-shot examples shared by single and batch query parsing
+PARSE_INSTRUCTIONS = """RULES:
+1. If energy type is not specified, infer from context (default to "solar" only if truly ambiguous)
+2. If region is not specified, set to null (do NOT default to Texas)
+3. Extract the exact region name mentioned by the user (e.g., Texas, California, Nevada)
+4. List the most important siting factors in criteria.primary and the rest in criteria.secondary
+
+Examples:
+- "solar farm in California" → {"energy_type": "solar", "region": "California", "size_acres": null, "criteria": {"primary": ["irradiance", "slope"], "secondary": []}}
+- "wind energy site in Nevada" → {"energy_type": "wind", "region": "Nevada", "size_acres": null, "criteria": {"primary": ["wind_speed", "elevation"], "secondary": []}}
+- "30 acre solar farm in Arizona" → {"energy_type": "solar", "region": "Arizona", "size_acres": 30, "criteria": {"primary": ["irradiance", "slope"], "secondary": ["land_cover"]}}"""
+
+# Static agent instructions go in system_instruction; only the templates below vary per call
+PARSE_SYSTEM = "You are a renewable energy site analyst. Parse user queries and extract key information.\n\n" + PARSE_INSTRUCTIONS
+
+_PARSE_TEMPLATE = string.Template('User Query: "$user_input"')
+
+_PARSE_BATCH_TEMPLATE = string.Template("""Parse each of these user queries and return a JSON array with exactly one object per query, in the same order:
+
+$queries""")
+
+EXPLAIN_SYSTEM = """You are a renewable energy consultant providing analysis results to a client.
+
+Write a concise 2-3 sentence explanation that:
+1. Highlights why this site scored well
+2. Mentions the key favorable metrics
+3. Provides one actionable insight or recommendation
+
+Be enthusiastic but professional. Keep it under 100 words."""
+
+_EXPLAIN_TEMPLATE = string.Template("""Project Details:
+- Energy Type: $energy_type
+- Region: $region
+- Sites Analyzed: $num_sites
+
+Top Site Performance:
+- Overall Score: $score/100
+- Location: $location
+- Solar Irradiance: $irradiance
+- Terrain Slope: $slope""")
+
+PREDICT_SYSTEM = """You are an AI forecasting expert specializing in renewable energy trends.
+
+Provide brief forecasts for 2025 and 2030, a confidence score from 0 to 100,
+three key trends, two risk factors and two opportunities.
+
+Focus on: market growth, technology improvements, policy changes, and environmental factors.
+Keep each field concise (under 20 words)."""
+
+_PREDICT_TEMPLATE = string.Template("""Based on the following site analysis data:
+- Energy Type: $energy_type
+- Region: $region
+- Sites Analyzed: $num_sites
+- Average Suitability Score: $avg_score/100
+- Top 10 Site Scores: $top_scores
+- Average Solar Irradiance: $avg_irradiance kWh/m²/day""")
+
+DEFAULT_CRITERIA = {
+    'solar': {"primary": ["irradiance", "slope"], "secondary": ["land_cover"]},
+    'wind': {"primary": ["wind_speed", "elevation"], "secondary": []},
+    'hydro': {"primary": ["elevation", "slope"], "secondary": []},
+    'geothermal': {"primary": ["elevation"], "secondary": []},
+}
+
+# Bump when an agent's system instruction or schema changes to invalidate its
+# cached answers; the model name is part of each key as well
+PARSE_CACHE_VERSION = 'parse_v2'
+PREDICT_CACHE_VERSION = 'predict_v2'
+
+NO_DATA_PREDICTION = {
+    "forecast": "Insufficient data for prediction",
+    "confidence": 0,
+    "trends": []
+}
+
+NO_SITES_EXPLANATION = "No suitable sites found in the specified region. Try adjusting your criteria or selecting a different region."
+
+# Per-site fields Agent 5 summarizes
+_SITE_STATS_DTYPE = np.dtype([('score', 'f8'), ('irradiance', 'f8')])
+_PARTITION_THRESHOLD = 1000
+
+# Markdown code fences Gemini sometimes wraps around JSON
+_FENCE_RE = re.compile(r'```(?:json)?', re.IGNORECASE)
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Keyword fallbacks for when Gemini's answer can't be used
+_ENERGY_RE = {
+    energy_type: re.compile(pattern, re.IGNORECASE)
+    for energy_type, pattern in {
+        'solar': r'solar|pv|photovoltaic',
+        'wind': r'wind|turbine',
+        'hydro': r'hydro|hydropower|water',
+        'geothermal': r'geothermal|geo-thermal'
+    }.items()
+}
+
+STATES = ('texas', 'california', 'nevada', 'arizona', 'new mexico', 'colorado',
+          'utah', 'florida', 'north carolina', 'new york', 'massachusetts',
+          'oregon', 'washington', 'montana', 'wyoming', 'idaho')
+
+_STATE_RE = re.compile(r'\b(' + '|'.join(STATES) + r')\b', re.IGNORECASE)
+
+_SIZE_RE = re.compile(r'(\d+)\s*acre', re.IGNORECASE)
+
+# "30 acre solar farm in Texas"-style queries parse without calling Gemini.
+# Only known states qualify; anything else ("west Texas") needs Gemini.
+_FAST_PARSE_RE = re.compile(
+    r"\s*(?P<size>\d+)\s*acres?\s+(?P<type>solar|wind|hydro|geothermal)\s+\w+"
+    r"\s+in\s+(?P<region>" + '|'.join(STATES) + r")\s*[.!?]?\s*",
+    re.IGNORECASE
+)
+
+# "Find solar farms in California"-style queries: a known energy type plus a
+# known state is everything Agent 1 needs, so these skip Gemini as well
+_SIMPLE_PARSE_RE = re.compile(
+    r"\s*(?:(?:find|show(?: me)?)\s+)?(?P<type>solar|wind|hydro|geothermal)"
+    r"(?:electric|power)?\b"
+    r"(?:\s+(?:energy|power|farms?|sites?|plants?|projects?|locations?))*"
+    r"\s+in\s+(?P<region>" + '|'.join(STATES) + r")\s*[.!?]?\s*",
+    re.IGNORECASE
+)
+
+
+# GEE datasets per energy type, built once at import. Tuples keep callers
+# from appending to the shared catalog.
+_DATASET_CATALOG = {
+    'solar': (
+        {
+            'name': 'Solar Irradiance',
+            'gee_id': 'ECMWF/ERA5_LAND/MONTHLY_AGGR',
+            'parameter': 'surface_solar_radiation_downwards_sum',
+            'relevance': 'primary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/ECMWF_ERA5_LAND_MONTHLY_AGGR',
+            'description': 'Monthly aggregated surface solar radiation from ERA5-Land reanalysis'
+        },
+        {
+            'name': 'Elevation/Slope',
+            'gee_id': 'USGS/SRTMGL1_003',
+            'parameter': 'elevation',
+            'relevance': 'primary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
+            'description': 'Shuttle Radar Topography Mission elevation data at 30m resolution'
+        },
+        {
+            'name': 'Land Cover',
+            'gee_id': 'ESA/WorldCover/v200',
+            'parameter': 'Map',
+            'relevance': 'secondary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/ESA_WorldCover_v200',
+            'description': 'Global land cover classification at 10m resolution'
+        },
+        {
+            'name': 'Protected Areas',
+            'gee_id': 'WCMC/WDPA/current/polygons',
+            'parameter': 'REP_AREA',
+            'relevance': 'secondary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/WCMC_WDPA_current_polygons',
+            'description': 'World Database on Protected Areas'
+        }
+    ),
+    'wind': (
+        {
+            'name': 'Wind Speed',
+            'gee_id': 'ECMWF/ERA5/DAILY',
+            'parameter': 'u_component_of_wind_10m',
+            'relevance': 'primary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/ECMWF_ERA5_DAILY',
+            'description': 'Daily wind speed at 10m height'
+        },
+        {
+            'name': 'Elevation/Slope',
+            'gee_id': 'USGS/SRTMGL1_003',
+            'parameter': 'elevation',
+            'relevance': 'primary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
+            'description': 'Terrain elevation for wind analysis'
         }
+    ),
+    'hydro': (
+        {
+            'name': 'Elevation/Slope',
+            'gee_id': 'USGS/SRTMGL1_003',
+            'parameter': 'elevation',
+            'relevance': 'primary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
+            'description': 'Elevation for hydro potential analysis'
+        },
+    ),
+    'geothermal': (
+        {
+            'name': 'Elevation/Slope',
+            'gee_id': 'USGS/SRTMGL1_003',
+            'parameter': 'elevation',
+            'relevance': 'primary',
+            'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
+            'description': 'Terrain data for geothermal site selection'
+        },
+    )
+}
+
+
+def _fast_parse(user_input):
+    """Deterministic Agent 1 parse for template-shaped queries, or None if Gemini is needed"""
+    match = _FAST_PARSE_RE.fullmatch(user_input) or _SIMPLE_PARSE_RE.fullmatch(user_input)
+    if not match:
+        return None
+    
+    energy_type = match['type'].lower()
+    size = match.groupdict().get('size')
+    return {
+        "energy_type": energy_type,
+        "region": match['region'].title(),
+        "size_acres": int(size) if size else None,
+        "criteria": {k: list(v) for k, v in DEFAULT_CRITERIA[energy_type].items()}
+    }
+
+
+def _parse_cache_key(user_input):
+    """Cache key for Agent 1, so re-typed queries differing only in case or spacing share a hit"""
+    return f"{PARSE_CACHE_VERSION}:{PARSER_MODEL}:{' '.join(user_input.lower().split())}"
+
+
+def _predict_cache_key(prompt):
+    """Cache key for Agent 5; the prompt alone omits PREDICT_SYSTEM and the schema"""
+    return f"{PREDICT_CACHE_VERSION}:{PARSER_MODEL}:{prompt}"
+
+
+@functools.cache
+def _configure_genai():
+    """Configure the Gemini client once per process"""
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in .env file!")
+    
+    # One multiplexed gRPC channel is shared by every agent model, so calls
+    # reuse the same keep-alive connection instead of new TLS handshakes
+    genai.configure(api_key=api_key, transport='grpc')
+
+
+@functools.cache
+def _get_model(model_name, system_instruction):
+    """One model per agent role, built on first use"""
+    _configure_genai()
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+
+class MultiAgentSystem:
+    # Generation configs are module constants shared by every instance
+    generation_config = GENERATION_CONFIG
+    parse_config = PARSE_CONFIG
+    parse_batch_config = PARSE_BATCH_CONFIG
+    predict_config = PREDICT_CONFIG
+    
+    def __init__(self):
+        # Fail fast on a missing API key; models are built on first use
+        _configure_genai()
+
+        # Identical prompts skip the Gemini round-trip entirely
+        self.cache = PromptCache()
         
+    @property
+    def parser_model(self):
+        return _get_model(PARSER_MODEL, PARSE_SYSTEM)
+    
+    @property
+    def explainer_model(self):
+        return _get_model(NARRATIVE_MODEL, EXPLAIN_SYSTEM)
+    
+    @property
+    def predictor_model(self):
+        return _get_model(PARSER_MODEL, PREDICT_SYSTEM)
+    
     def _extract_json_from_text(self, text):
         """Extract JSON from text that might contain markdown or extra text"""
         
         # First, try removing markdown code blocks
-        text_clean = re.sub(r'```json\s*', '', text, flags=re.IGNORECASE)
-        text_clean = re.sub(r'```\s*', '', text_clean)
-        text_clean = text_clean.strip()
+        text_clean = _FENCE_RE.sub('', text).strip()
         
         # Try parsing the cleaned text directly
         try:
-            return json.loads(text_clean)
-        except:
+            return orjson.loads(text_clean)
+        except orjson.JSONDecodeError:
             pass
         
-        # Try to find JSON object boundaries more carefully
-        # Find the first { and match it with the last }
+        # Decode the first parseable object starting at any '{' (C-level scan,
+        # tolerates prose before and after the JSON)
         start = text_clean.find('{')
-        if start >= 0:
-            # Find matching closing brace by counting braces
-            brace_count = 0
-            end = start
-            for i in range(start, len(text_clean)):
-                if text_clean[i] == '{':
-                    brace_count += 1
-                elif text_clean[i] == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end = i + 1
-                        break
-            
-            if end > start:
-                try:
-                    json_str = text_clean[start:end]
-                    return json.loads(json_str)
-                except:
-                    pass
-        
-        # Last resort: try to find any JSON-like structure
-        # Look for patterns like {"key": "value"}
-        json_pattern = r'\{[^{}]*"[^"]*"[^{}]*\}'
-        matches = re.findall(json_pattern, text_clean, re.DOTALL)
-        for match in matches:
+        while start >= 0:
             try:
-                return json.loads(match)
-            except:
-                continue
+                obj, _ = _JSON_DECODER.raw_decode(text_clean, start)
+                return obj
+            except json.JSONDecodeError:
+                start = text_clean.find('{', start + 1)
         
         return None
     
-    def _extract_info_from_text(self, text, user_input):
+    def _extract_info_from_text(self, text, user_input=None):
         """Fallback: Try to extract energy_type and region from text using simple patterns"""
         
         result = {
@@ -84,348 +428,316 @@ class MultiAgentSystem:
             "criteria": {"primary": ["irradiance", "slope"], "secondary": []}
         }
         
-        # Try to find energy type
-        energy_patterns = {
-            'solar': r'solar|pv|photovoltaic',
-            'wind': r'wind|turbine',
-            'hydro': r'hydro|hydropower|water',
-            'geothermal': r'geothermal|geo-thermal'
-        }
-        
-        text_lower = text.lower() + " " + user_input.lower()
-        for energy_type, pattern in energy_patterns.items():
-            if re.search(pattern, text_lower):
+        # Try to find energy type. The patterns are case-insensitive, so the
+        # text is scanned as-is instead of lowercasing copies of it.
+        haystack = text if user_input is None else f"{text} {user_input}"
+        for energy_type, pattern in _ENERGY_RE.items():
+            if pattern.search(haystack):
                 result['energy_type'] = energy_type
                 break
         
-        # Try to find region (US states)
-        states = ['texas', 'california', 'nevada', 'arizona', 'new mexico', 'colorado', 
-                 'utah', 'florida', 'north carolina', 'new york', 'massachusetts',
-                 'oregon', 'washington', 'montana', 'wyoming', 'idaho']
-        
-        for state in states:
-            if state in text_lower:
-                result['region'] = state.title()
-                break
+        # Try to find region (US states) in a single scan
+        state_match = _STATE_RE.search(haystack)
+        if state_match:
+            result['region'] = state_match.group(1).title()
         
         # Try to find size
-        size_match = re.search(r'(\d+)\s*acre', text_lower)
+        size_match = _SIZE_RE.search(haystack)
         if size_match:
             result['size_acres'] = int(size_match.group(1))
         
         return result
 
+    def _complete_parsed_query(self, parsed, user_input):
+        """Fills in fields Gemini left empty in a parsed query"""
+        
+        # Validate required fields but don't default to Texas if region is missing
+        if 'energy_type' not in parsed or not parsed['energy_type']:
+            parsed['energy_type'] = 'solar'
+            logger.warning(f"   ⚠️ Missing energy_type, defaulting to solar")
+        
+        if 'region' not in parsed or not parsed['region']:
+            # Try to extract from user input as fallback
+            fallback_info = self._extract_info_from_text(user_input, user_input)
+            parsed['region'] = fallback_info['region']
+            if not parsed['region']:
+                logger.warning(f"   ⚠️ No region found in query, setting to null")
+                parsed['region'] = None
+            else:
+                logger.info(f"   ✓ Extracted region from user input: {parsed['region']}")
+        
+        if 'criteria' not in parsed:
+            parsed['criteria'] = {"primary": ["irradiance", "slope"], "secondary": []}
+        
+        logger.info(f"   ✓ Final parsed: {parsed['energy_type']} in {parsed['region']}")
+        return parsed
+    
     def agent_1_parse_query(self, user_input):
         """Agent 1: Query Parser - Understands user intent using Gemini"""
         
-        prompt = f"""You are a renewable energy site analyst. Parse this user query and extract key information:
-
-User Query: "{user_input}"
-
-Extract and return ONLY valid JSON (no markdown, no code blocks, no explanations):
-{{
-    "energy_type": "solar|wind|hydro|geothermal",
-    "region": "state or region name (e.g., Texas, California, Nevada)",
-    "size_acres": number or null,
-    "criteria": {{
-        "primary": ["list of important factors"],
-        "secondary": ["list of secondary factors"]
-    }}
-}}
-
-IMPORTANT RULES:
-1. Output ONLY the JSON object, nothing else
-2. If energy type is not specified, infer from context (default to "solar" only if truly ambiguous)
-3. If region is not specified, set to null (do NOT default to Texas)
-4. Extract the exact region name mentioned by the user
-5. Use proper JSON format with double quotes
-
-Examples:
-- "solar farm in California" → {{"energy_type": "solar", "region": "California", "size_acres": null, "criteria": {{"primary": ["irradiance", "slope"], "secondary": []}}}}
-- "wind energy site in Nevada" → {{"energy_type": "wind", "region": "Nevada", "size_acres": null, "criteria": {{"primary": ["wind_speed", "elevation"], "secondary": []}}}}
-- "30 acre solar farm in Arizona" → {{"energy_type": "solar", "region": "Arizona", "size_acres": 30, "criteria": {{"primary": ["irradiance", "slope"], "secondary": ["land_cover"]}}}}"""
+        parsed = _fast_parse(user_input)
+        if parsed:
+            logger.info(f"   ⚡ Fast-path parse: {parsed['energy_type']} in {parsed['region']}")
+            return parsed
+        
+        cache_key = _parse_cache_key(user_input)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"   ⚡ Cache hit: {cached['energy_type']} in {cached['region']}")
+            return cached
+        
+        prompt = _PARSE_TEMPLATE.substitute(user_input=user_input)
 
         text = None
         try:
-            print(f"   📤 Sending to Gemini: '{user_input[:50]}...'")
-            response = self.model.generate_content(
+            logger.info(f"   📤 Sending to Gemini: '{user_input[:50]}...'")
+            response = self.parser_model.generate_content(
                 prompt,
-                generation_config=self.generation_config
+                generation_config=self.parse_config,
+                request_options=REQUEST_OPTIONS
             )
             
             text = response.text.strip()
-            print(f"   📥 Raw Gemini response: {text[:200]}...")
+            logger.info(f"   📥 Raw Gemini response: {text[:200]}...")
             
-            # Try multiple methods to extract JSON
-            parsed = self._extract_json_from_text(text)
+            # JSON mode should hand back clean JSON; keep the lenient extractor as a safety net
+            try:
+                parsed = orjson.loads(text)
+            except orjson.JSONDecodeError:
+                parsed = self._extract_json_from_text(text)
             
             if parsed:
-                print(f"   ✓ Successfully parsed JSON from Gemini")
-                
-                # Validate required fields but don't default to Texas if region is missing
-                if 'energy_type' not in parsed or not parsed['energy_type']:
-                    parsed['energy_type'] = 'solar'
-                    print(f"   ⚠️ Missing energy_type, defaulting to solar")
-                
-                if 'region' not in parsed or not parsed['region']:
-                    # Try to extract from user input as fallback
-                    fallback_info = self._extract_info_from_text(user_input, user_input)
-                    parsed['region'] = fallback_info['region']
-                    if not parsed['region']:
-                        print(f"   ⚠️ No region found in query, setting to null")
-                        parsed['region'] = None
-                    else:
-                        print(f"   ✓ Extracted region from user input: {parsed['region']}")
-                
-                if 'criteria' not in parsed:
-                    parsed['criteria'] = {"primary": ["irradiance", "slope"], "secondary": []}
-                
-                print(f"   ✓ Final parsed: {parsed['energy_type']} in {parsed['region']}")
+                logger.info(f"   ✓ Successfully parsed JSON from Gemini")
+                parsed = self._complete_parsed_query(parsed, user_input)
+                self.cache.set(cache_key, parsed)
                 return parsed
             else:
-                print(f"   ⚠️ Could not parse JSON, trying fallback extraction")
+                logger.warning(f"   ⚠️ Could not parse JSON, trying fallback extraction")
                 # Fallback: try to extract info from the response text and user input
+                # (the user input is scanned too, so there is no separate state check)
                 parsed = self._extract_info_from_text(text, user_input)
                 
-                if not parsed['region']:
-                    print(f"   ⚠️ Still no region found, checking user input directly")
-                    # Last resort: check user input directly
-                    user_lower = user_input.lower()
-                    states = ['texas', 'california', 'nevada', 'arizona', 'new mexico', 
-                             'colorado', 'utah', 'florida', 'north carolina', 'new york']
-                    for state in states:
-                        if state in user_lower:
-                            parsed['region'] = state.title()
-                            print(f"   ✓ Found region in user input: {parsed['region']}")
-                            break
-                
-                print(f"   ✓ Fallback parsed: {parsed['energy_type']} in {parsed['region']}")
+                logger.info(f"   ✓ Fallback parsed: {parsed['energy_type']} in {parsed['region']}")
                 return parsed
             
         except Exception as e:
-            print(f"   ❌ Agent 1 error: {e}")
-            print(f"   Error type: {type(e).__name__}")
+            logger.error(f"   ❌ Agent 1 error: {e}")
+            logger.error(f"   Error type: {type(e).__name__}")
             if text:
-                print(f"   Response text: {text[:500]}")
+                logger.error(f"   Response text: {text[:500]}")
             
             # Last resort: try to extract from user input directly
-            print(f"   🔍 Attempting direct extraction from user input")
-            parsed = self._extract_info_from_text(user_input, user_input)
+            logger.info(f"   🔍 Attempting direct extraction from user input")
+            parsed = self._extract_info_from_text(user_input)
             
             if not parsed['region']:
-                print(f"   ⚠️ WARNING: No region could be extracted from: '{user_input}'")
-                print(f"   Setting region to null (will need user clarification)")
+                logger.warning(f"   ⚠️ WARNING: No region could be extracted from: '{user_input}'")
+                logger.warning(f"   Setting region to null (will need user clarification)")
                 parsed['region'] = None
             
             return parsed
     
+    def agent_1_parse_queries_batch(self, user_inputs):
+        """Agent 1 (batch): parses several queries with a single Gemini call"""
+        
+        # Fast-path and cached parses never reach the batch prompt
+        results = [None] * len(user_inputs)
+        pending = []
+        for i, user_input in enumerate(user_inputs):
+            parsed = _fast_parse(user_input) or self.cache.get(_parse_cache_key(user_input))
+            if parsed is not None:
+                results[i] = parsed
+            else:
+                pending.append(i)
+        
+        if pending:
+            numbered = "\n".join(f'{n}. "{user_inputs[i]}"' for n, i in enumerate(pending, 1))
+            prompt = _PARSE_BATCH_TEMPLATE.substitute(queries=numbered)
+            
+            try:
+                logger.info(f"   📤 Sending {len(pending)} queries to Gemini in one batch")
+                response = self.parser_model.generate_content(
+                    prompt,
+                    generation_config=self.parse_batch_config,
+                    request_options=REQUEST_OPTIONS
+                )
+                batch = orjson.loads(response.text)
+                
+                if len(batch) == len(pending):
+                    for i, parsed in zip(pending, batch):
+                        user_input = user_inputs[i]
+                        results[i] = self._complete_parsed_query(parsed, user_input)
+                        self.cache.set(_parse_cache_key(user_input), results[i])
+                else:
+                    logger.warning(f"   ⚠️ Batch returned {len(batch)} results for {len(pending)} queries")
+                    
+            except Exception as e:
+                logger.warning(f"   ⚠️ Agent 1 batch error: {e}")
+        
+        # Anything the batch call couldn't handle goes through the single-query path
+        for i, user_input in enumerate(user_inputs):
+            if results[i] is None:
+                results[i] = self.agent_1_parse_query(user_input)
+        
+        return results
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _discover_datasets(energy_type, primary):
+        """Catalog entries matching any primary criterion (all entries if none match)"""
+        
+        catalog = _DATASET_CATALOG.get(energy_type, _DATASET_CATALOG['solar'])
+        wanted = [c.lower().replace('_', ' ') for c in primary]
+        matches = tuple(
+            d for d in catalog
+            if any(w in d['name'].lower() or w in d['parameter'].lower() for w in wanted)
+        )
+        return matches or catalog
+    
     def agent_2_discover_datasets(self, energy_type, criteria):
         """Agent 2: Dataset Discovery - Finds relevant GEE datasets"""
         
-        dataset_catalog = {
-            'solar': [
-                {
-                    'name': 'Solar Irradiance',
-                    'gee_id': 'ECMWF/ERA5_LAND/MONTHLY_AGGR',
-                    'parameter': 'surface_solar_radiation_downwards_sum',
-                    'relevance': 'primary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/ECMWF_ERA5_LAND_MONTHLY_AGGR',
-                    'description': 'Monthly aggregated surface solar radiation from ERA5-Land reanalysis'
-                },
-                {
-                    'name': 'Elevation/Slope',
-                    'gee_id': 'USGS/SRTMGL1_003',
-                    'parameter': 'elevation',
-                    'relevance': 'primary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
-                    'description': 'Shuttle Radar Topography Mission elevation data at 30m resolution'
-                },
-                {
-                    'name': 'Land Cover',
-                    'gee_id': 'ESA/WorldCover/v200',
-                    'parameter': 'Map',
-                    'relevance': 'secondary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/ESA_WorldCover_v200',
-                    'description': 'Global land cover classification at 10m resolution'
-                },
-                {
-                    'name': 'Protected Areas',
-                    'gee_id': 'WCMC/WDPA/current/polygons',
-                    'parameter': 'REP_AREA',
-                    'relevance': 'secondary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/WCMC_WDPA_current_polygons',
-                    'description': 'World Database on Protected Areas'
-                }
-            ],
-            'wind': [
-                {
-                    'name': 'Wind Speed',
-                    'gee_id': 'ECMWF/ERA5/DAILY',
-                    'parameter': 'u_component_of_wind_10m',
-                    'relevance': 'primary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/ECMWF_ERA5_DAILY',
-                    'description': 'Daily wind speed at 10m height'
-                },
-                {
-                    'name': 'Elevation/Slope',
-                    'gee_id': 'USGS/SRTMGL1_003',
-                    'parameter': 'elevation',
-                    'relevance': 'primary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
-                    'description': 'Terrain elevation for wind analysis'
-                }
-            ],
-            'hydro': [
-                {
-                    'name': 'Elevation/Slope',
-                    'gee_id': 'USGS/SRTMGL1_003',
-                    'parameter': 'elevation',
-                    'relevance': 'primary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
-                    'description': 'Elevation for hydro potential analysis'
-                }
-            ],
-            'geothermal': [
-                {
-                    'name': 'Elevation/Slope',
-                    'gee_id': 'USGS/SRTMGL1_003',
-                    'parameter': 'elevation',
-                    'relevance': 'primary',
-                    'url': 'https://developers.google.com/earth-engine/datasets/catalog/USGS_SRTMGL1_003',
-                    'description': 'Terrain data for geothermal site selection'
-                }
-            ]
-        }
-        
-        datasets = dataset_catalog.get(energy_type, dataset_catalog['solar'])
-        print(f"   ✓ Found {len(datasets)} datasets for {energy_type}")
+        primary = tuple((criteria or {}).get('primary') or ())
+        datasets = self._discover_datasets(energy_type, primary)
+        logger.info(f"   ✓ Found {len(datasets)} datasets for {energy_type}")
         return datasets
     
+    def _explain_prompt(self, sites, energy_type, region):
+        """Builds the Agent 4 prompt around the top-ranked site"""
+        
+        top_site = sites[0]
+        lat = top_site.get('lat', 0)
+        lon = top_site.get('lon', 0)
+        
+        return _EXPLAIN_TEMPLATE.substitute(
+            energy_type=energy_type,
+            region=region,
+            num_sites=len(sites),
+            score=top_site.get('score', 0),
+            location=f"{lat:.2f}°N, {abs(lon):.2f}°W",
+            irradiance=f"{top_site['irradiance']:.2f} kWh/m²/day" if 'irradiance' in top_site else 'N/A',
+            slope=f"{top_site['slope']:.2f}°" if 'slope' in top_site else 'N/A'
+        )
+    
+    def _explain_fallback(self, sites, energy_type, region):
+        """Canned Agent 4 explanation used when Gemini fails"""
+        return f"Analysis complete for {region}. The top site scored {sites[0].get('score', 0)}/100, showing excellent potential for {energy_type} energy production based on favorable terrain and resource availability."
+    
     def agent_4_explain_results(self, sites, energy_type, region):
         """Agent 4: Results Explainer - Natural language insights using Gemini"""
+        try:
+            return ''.join(self.stream_explanation(sites, energy_type, region, partial_ok=False)).strip()
+        except Exception:
+            # The stream broke off mid-sentence; the canned text reads better than a fragment
+            return self._explain_fallback(sites, energy_type, region)
+    
+    def stream_explanation(self, sites, energy_type, region, partial_ok=True):
+        """Agent 4 (streaming): yields explanation text as Gemini generates it (partial_ok=False re-raises a mid-stream failure)"""
         
         if not sites or len(sites) == 0:
-            return "No suitable sites found in the specified region. Try adjusting your criteria or selecting a different region."
+            yield NO_SITES_EXPLANATION
+            return
         
-        top_site = sites[0]
-        
-        # Prepare site metrics for the prompt
-        metrics_summary = {
-            'score': top_site.get('score', 0),
-            'location': f"{top_site.get('lat', 0):.2f}°N, {abs(top_site.get('lon', 0)):.2f}°W",
-            'irradiance': f"{top_site.get('irradiance', 0):.2f} kWh/m²/day" if 'irradiance' in top_site else 'N/A',
-            'slope': f"{top_site.get('slope', 0):.2f}°" if 'slope' in top_site else 'N/A'
-        }
+        prompt = self._explain_prompt(sites, energy_type, region)
         
-        prompt = f"""You are a renewable energy consultant providing analysis results to a client.
-
-Project Details:
-- Energy Type: {energy_type}
-- Region: {region}
-- Sites Analyzed: {len(sites)}
-
-Top Site Performance:
-- Overall Score: {metrics_summary['score']}/100
-- Location: {metrics_summary['location']}
-- Solar Irradiance: {metrics_summary['irradiance']}
-- Terrain Slope: {metrics_summary['slope']}
-
-Write a concise 2-3 sentence explanation that:
-1. Highlights why this site scored well
-2. Mentions the key favorable metrics
-3. Provides one actionable insight or recommendation
-
-Be enthusiastic but professional. Keep it under 100 words."""
-
+        streamed = 0
         try:
-            response = self.model.generate_content(
+            response = self.explainer_model.generate_content(
                 prompt,
-                generation_config=self.generation_config
+                generation_config=self.generation_config,
+                request_options=REQUEST_OPTIONS,
+                stream=True
             )
             
-            explanation = response.text.strip()
-            print(f"   ✓ Generated explanation ({len(explanation)} chars)")
-            return explanation
+            for chunk in response:
+                streamed += len(chunk.text)
+                yield chunk.text
+            logger.info(f"   ✓ Streamed explanation ({streamed} chars)")
             
         except Exception as e:
-            print(f"   ⚠️ Agent 4 error: {e}")
-            # Fallback explanation
-            return f"Analysis complete for {region}. The top site scored {metrics_summary['score']}/100, showing excellent potential for {energy_type} energy production based on favorable terrain and resource availability."
+            logger.warning(f"   ⚠️ Agent 4 error: {e}")
+            # Fallback explanation, unless the client already has partial text
+            if not streamed:
+                yield self._explain_fallback(sites, energy_type, region)
+            elif not partial_ok:
+                raise
+    
+    def _predict_prompt(self, stats, energy_type, region):
+        """Builds the Agent 5 prompt from summary statistics of the sites"""
+        return _PREDICT_TEMPLATE.substitute(
+            energy_type=energy_type,
+            region=region,
+            num_sites=stats.num_sites,
+            avg_score=f"{stats.avg_score:.1f}",
+            # Whole-number scores print as ints, as in the API's site payloads
+            top_scores=f"[{', '.join(f'{s:g}' for s in stats.top_scores)}]",
+            avg_irradiance=f"{stats.avg_irradiance:.2f}"
+        )
+    
+    def _predict_fallback(self, energy_type, region):
+        """Canned Agent 5 prediction used when Gemini fails"""
+        return {
+            "forecast_2025": f"{energy_type.capitalize()} capacity in {region} projected to grow 15-20%",
+            "forecast_2030": f"Market maturity expected with 50%+ increase in installations",
+            "confidence_score": 75,
+            "key_trends": ["Policy support increasing", "Technology costs declining", "Grid infrastructure improving"],
+            "risk_factors": ["Regulatory changes", "Supply chain constraints"],
+            "opportunities": ["Federal incentives", "Corporate sustainability goals"]
+        }
+    
+    def _cached_prediction(self, cache_key, energy_type, region):
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"   ⚡ Cache hit for predictions ({energy_type} in {region})")
+        return cached
+    
+    def _store_prediction(self, cache_key, text):
+        # Same lenient path as Agent 1: fenced or prose-wrapped JSON still
+        # parses; only a reply with no JSON at all drops to the canned fallback
+        prediction = self._extract_json_from_text(text)
+        if not isinstance(prediction, dict):
+            raise ValueError(f"no JSON object in Gemini response: {text[:100]!r}")
+        logger.info(f"   ✓ Generated predictions (confidence: {prediction.get('confidence_score', 0)}%)")
+        self.cache.set(cache_key, prediction)
+        return prediction
     
     def agent_5_predict_trends(self, sites, energy_type, region):
         """Agent 5: Predictive Intelligence - Forecasts and trend analysis using Gemini"""
         
-        if not sites or len(sites) == 0:
-            return {
-                "forecast": "Insufficient data for prediction",
-                "confidence": 0,
-                "trends": []
-            }
-        
-        # Calculate statistics from sites
-        avg_score = sum(s.get('score', 0) for s in sites) / len(sites)
-        top_scores = [s.get('score', 0) for s in sites[:10]]
-        avg_irradiance = sum(s.get('irradiance', 0) for s in sites) / len(sites)
-        
-        prompt = f"""You are an AI forecasting expert specializing in renewable energy trends.
-
-Based on the following site analysis data:
-- Energy Type: {energy_type}
-- Region: {region}
-- Sites Analyzed: {len(sites)}
-- Average Suitability Score: {avg_score:.1f}/100
-- Top 10 Site Scores: {top_scores}
-- Average Solar Irradiance: {avg_irradiance:.2f} kWh/m²/day
-
-Provide predictions in JSON format (NO markdown, NO code blocks):
-{{
-    "forecast_2025": "brief prediction for 2025",
-    "forecast_2030": "brief prediction for 2030",
-    "confidence_score": number 0-100,
-    "key_trends": ["trend1", "trend2", "trend3"],
-    "risk_factors": ["risk1", "risk2"],
-    "opportunities": ["opportunity1", "opportunity2"]
-}}
-
-Focus on: market growth, technology improvements, policy changes, and environmental factors.
-Keep each field concise (under 20 words)."""
-
+        if not sites:
+            return dict(NO_DATA_PREDICTION)
+        
+        # Callers that already summarized the sites (e.g. /api/predict's region cache) pass SiteStats
+        stats = sites if isinstance(sites, SiteStats) else SiteStats.from_sites(sites)
+        prompt = self._predict_prompt(stats, energy_type, region)
+        cache_key = _predict_cache_key(prompt)
+        cached = self._cached_prediction(cache_key, energy_type, region)
+        if cached is not None:
+            return cached
+        
         try:
-            response = self.model.generate_content(
+            response = self.predictor_model.generate_content(
                 prompt,
-                generation_config=self.generation_config
+                generation_config=self.predict_config,
+                request_options=REQUEST_OPTIONS
             )
-            
-            text = response.text.strip()
-            text = text.replace('```json', '').replace('```', '').strip()
-            
-            prediction = json.loads(text)
-            print(f"   ✓ Generated predictions (confidence: {prediction.get('confidence_score', 0)}%)")
-            return prediction
+            return self._store_prediction(cache_key, response.text)
             
         except Exception as e:
-            print(f"   ⚠️ Agent 5 error: {e}")
-            # Fallback prediction
-            return {
-                "forecast_2025": f"{energy_type.capitalize()} capacity in {region} projected to grow 15-20%",
-                "forecast_2030": f"Market maturity expected with 50%+ increase in installations",
-                "confidence_score": 75,
-                "key_trends": ["Policy support increasing", "Technology costs declining", "Grid infrastructure improving"],
-                "risk_factors": ["Regulatory changes", "Supply chain constraints"],
-                "opportunities": ["Federal incentives", "Corporate sustainability goals"]
-            }
+            logger.warning(f"   ⚠️ Agent 5 error: {e}")
+            return self._predict_fallback(energy_type, region)
     
     def process_full_query(self, user_input):
         """Orchestrates all agents in sequence"""
         
-        print(f"\n🎯 Processing: '{user_input}'")
+        logger.info(f"\n🎯 Processing: '{user_input}'")
         
         # Agent 1: Parse query
-        print("🤖 Agent 1: Parsing query (Gemini)...")
+        logger.info("🤖 Agent 1: Parsing query (Gemini)...")
         parsed = self.agent_1_parse_query(user_input)
         
         # Agent 2: Discover datasets
-        print("🔍 Agent 2: Discovering datasets...")
+        logger.info("🔍 Agent 2: Discovering datasets...")
         datasets = self.agent_2_discover_datasets(
             parsed['energy_type'], 
             parsed.get('criteria', {})
@@ -435,4 +747,10 @@ Keep each field concise (under 20 words)."""
             'parsed_query': parsed,
             'datasets': datasets,
             'ready_for_gee': True
-        }
\ No newline at end of file
+        }
+
+
+@functools.cache
+def get_agent_system():
+    """Process-wide MultiAgentSystem, so the Gemini client and caches are built once"""
+    return MultiAgentSystem()
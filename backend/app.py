@@ -1,21 +1,100 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-from agent_system import MultiAgentSystem
-from gee_queries import GEEQueryAgent
+from agent_system import get_agent_system, SiteStats, PARSER_MODEL, NARRATIVE_MODEL
+from gee_queries import GEEQueryAgent, FallbackSites, REGION_BBOXES
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import logging
+import orjson
+import queue
+import threading
 import traceback
 
+# Request threads only enqueue log records; a background listener does the writes
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s %(name)s %(message)s',
+    handlers=[QueueHandler(log_queue)]
+)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logger = logging.getLogger("terralink.api")
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class OrjsonProvider(JSONProvider):
+    """jsonify via orjson: several times faster on the site-heavy payloads and emits bytes directly"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=ORJSON_OPTIONS), mimetype='application/json')
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # Initialize agents
-agent_system = MultiAgentSystem()
+agent_system = get_agent_system()
 gee_agent = GEEQueryAgent()
 
+# Shared pool for independent Gemini calls; the SDK releases the GIL while
+# waiting on the network, so threads are enough to overlap them
+agent_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='agent')
+
+# /api/predict/batch gets its own small pool so bulk jobs can't starve the
+# interactive endpoints sharing agent_executor
+batch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='batch')
+MAX_BATCH_PAIRS = 20
+
+# Normalized region -> SiteStats for the predict endpoints, least recently used first
+_region_stats_cache = OrderedDict()
+_region_stats_lock = threading.Lock()
+REGION_STATS_CACHE_SIZE = 256
+
+def _region_stats(region):
+    """Agent 5's summary of a region's GEE sample, fetched once per region for the predict endpoints"""
+    key = region.lower().strip()
+    with _region_stats_lock:
+        stats = _region_stats_cache.get(key)
+        if stats is not None:
+            _region_stats_cache.move_to_end(key)
+            return stats
+    
+    sites = gee_agent.query_solar_sites(
+        region_name=region,
+        datasets=[],
+        num_samples=100
+    )
+    stats = SiteStats.from_sites(sites) if sites else None
+    
+    # Mock sites from a transient GEE failure would otherwise pin fake stats until restart
+    if stats is not None and not isinstance(sites, FallbackSites):
+        with _region_stats_lock:
+            _region_stats_cache[key] = stats
+            _region_stats_cache.move_to_end(key)
+            while len(_region_stats_cache) > REGION_STATS_CACHE_SIZE:
+                _region_stats_cache.popitem(last=False)
+    return stats
+
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({
         'status': 'healthy',
-        'ai_model': 'Google Gemini Pro',
+        'ai_model': f'Google Gemini ({PARSER_MODEL}, {NARRATIVE_MODEL})',
         'gee_status': 'connected' if gee_agent.gee_available else 'mock_mode'
     })
 
@@ -44,65 +123,74 @@ def chat():
             'response': response_text,
             'parsed': parsed,
             'datasets': result['datasets'],
-            'ai_model': 'gemini-pro',
+            'ai_model': PARSER_MODEL,
             'needs_clarification': not parsed.get('region')
         })
     
     except Exception as e:
-        print(traceback.format_exc())
+        logger.error(traceback.format_exc())
         return jsonify({
             'error': str(e),
             'response': 'Sorry, I encountered an error processing your request. Please try again or rephrase your query.'
         }), 500
 
+def _locate_sites(user_query):
+    """Agents 1-3 for the analyze endpoints: returns (parsed, datasets, sites, error_response)"""
+    
+    # Agent 1 & 2
+    result = agent_system.process_full_query(user_query)
+    parsed = result['parsed_query']
+    datasets = result['datasets']
+    
+    # Check if region was parsed
+    if not parsed.get('region'):
+        return parsed, datasets, None, (jsonify({
+            'success': False,
+            'error': 'Could not determine the region from your query. Please specify a region (e.g., "solar farm in California" or "wind site in Nevada")',
+            'parsed_query': parsed,
+            'suggestions': 'Try including a state or region name in your query, such as: "Find solar sites in Texas" or "Wind energy in California"'
+        }), 400)
+    
+    # Agent 3: GEE Data Fetching
+    try:
+        sites = gee_agent.query_solar_sites(
+            region_name=parsed['region'],
+            datasets=datasets,
+            num_samples=100
+        )
+    except ValueError as e:
+        return parsed, datasets, None, (jsonify({
+            'success': False,
+            'error': str(e),
+            'parsed_query': parsed,
+            'suggestions': f'The region "{parsed["region"]}" might not be supported. Try: Texas, California, Nevada, Arizona, New Mexico, Colorado, or Utah'
+        }), 400)
+    
+    return parsed, datasets, sites, None
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
     try:
         data = request.json
-        user_query = data.get('query', '')
-        
-        # Agent 1 & 2
-        result = agent_system.process_full_query(user_query)
-        parsed = result['parsed_query']
-        datasets = result['datasets']
-        
-        # Check if region was parsed
-        if not parsed.get('region'):
-            return jsonify({
-                'success': False,
-                'error': 'Could not determine the region from your query. Please specify a region (e.g., "solar farm in California" or "wind site in Nevada")',
-                'parsed_query': parsed,
-                'suggestions': 'Try including a state or region name in your query, such as: "Find solar sites in Texas" or "Wind energy in California"'
-            }), 400
+        parsed, datasets, sites, error = _locate_sites(data.get('query', ''))
+        if error:
+            return error
         
-        # Agent 3: GEE Data Fetching
-        try:
-            sites = gee_agent.query_solar_sites(
-                region_name=parsed['region'],
-                datasets=datasets,
-                num_samples=100
-            )
-        except ValueError as e:
-            return jsonify({
-                'success': False,
-                'error': str(e),
-                'parsed_query': parsed,
-                'suggestions': f'The region "{parsed["region"]}" might not be supported. Try: Texas, California, Nevada, Arizona, New Mexico, Colorado, or Utah'
-            }), 400
-        
-        # Agent 4: Explanation
-        explanation = agent_system.agent_4_explain_results(
+        # Agent 4 (Explanation) & Agent 5 (Predictive Intelligence) run concurrently
+        explain_future = agent_executor.submit(
+            agent_system.agent_4_explain_results,
             sites=sites[:10],
             energy_type=parsed['energy_type'],
             region=parsed['region']
         )
-        
-        # Agent 5: Predictive Intelligence (NEW!)
-        predictions = agent_system.agent_5_predict_trends(
+        predict_future = agent_executor.submit(
+            agent_system.agent_5_predict_trends,
             sites=sites,
             energy_type=parsed['energy_type'],
             region=parsed['region']
         )
+        explanation = explain_future.result()
+        predictions = predict_future.result()
         
         return jsonify({
             'success': True,
@@ -112,13 +200,73 @@ def analyze():
             'predictions': predictions,  # NEW!
             'parsed_query': parsed,
             'total_analyzed': len(sites),
-            'ai_model': 'gemini-pro'
+            'ai_model': NARRATIVE_MODEL
         })
     
     except Exception as e:
-        print(traceback.format_exc())
+        logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """/api/analyze as Server-Sent Events: sites first, then explanation text as it streams, then predictions"""
+    try:
+        data = request.json
+        parsed, datasets, sites, error = _locate_sites(data.get('query', ''))
+        if error:
+            return error
+        
+        # Agent 5 runs in the background while Agent 4 streams
+        predict_future = agent_executor.submit(
+            agent_system.agent_5_predict_trends,
+            sites=sites,
+            energy_type=parsed['energy_type'],
+            region=parsed['region']
+        )
+    
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+    
+    def events():
+        summary = {
+            'sites': sites[:20],
+            'datasets': datasets,
+            'parsed_query': parsed,
+            'total_analyzed': len(sites),
+            'ai_model': NARRATIVE_MODEL
+        }
+        yield f"event: sites\ndata: {app.json.dumps(summary)}\n\n"
+        for text in agent_system.stream_explanation(sites[:10], parsed['energy_type'], parsed['region']):
+            yield f"data: {app.json.dumps({'text': text})}\n\n"
+        yield f"event: predictions\ndata: {app.json.dumps(predict_future.result())}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream')
+
+@app.route('/api/explain/stream', methods=['POST'])
+def explain_stream():
+    """Streams Agent 4's explanation as Server-Sent Events"""
+    try:
+        data = request.json
+        sites = data.get('sites', [])
+        energy_type = data.get('energy_type', 'solar')
+        region = data.get('region', 'Texas')
+        
+        if not isinstance(sites, list) or not all(isinstance(site, dict) for site in sites):
+            return jsonify({'error': 'sites must be a list of site objects'}), 400
+    
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+    
+    def events():
+        for text in agent_system.stream_explanation(sites[:10], energy_type, region):
+            yield f"data: {app.json.dumps({'text': text})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream')
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """NEW ENDPOINT: Dedicated predictive intelligence endpoint"""
@@ -127,16 +275,9 @@ def predict():
         energy_type = data.get('energy_type', 'solar')
         region = data.get('region', 'Texas')
         
-        # Get site data
-        sites = gee_agent.query_solar_sites(
-            region_name=region,
-            datasets=[],
-            num_samples=100
-        )
-        
-        # Generate predictions
+        # Generate predictions from the region's cached site statistics
         predictions = agent_system.agent_5_predict_trends(
-            sites=sites,
+            sites=_region_stats(region),
             energy_type=energy_type,
             region=region
         )
@@ -146,16 +287,77 @@ def predict():
             'predictions': predictions,
             'region': region,
             'energy_type': energy_type,
-            'ai_model': 'gemini-pro'
+            'ai_model': PARSER_MODEL
+        })
+    
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Agent 5 for up to MAX_BATCH_PAIRS (energy_type, region) pairs in one request, run concurrently on batch_executor"""
+    try:
+        data = request.json
+        items = data.get('requests', [])
+        
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return jsonify({'error': 'requests must list energy_type/region pairs'}), 400
+        
+        # Repeated pairs are only predicted once
+        pairs = list(dict.fromkeys(
+            (item.get('energy_type', 'solar'), item.get('region', 'Texas'))
+            for item in items
+        ))
+        
+        # Reject unsupported regions up front instead of failing the batch midway
+        unsupported = [
+            region for _, region in pairs
+            if not isinstance(region, str) or region.lower().strip() not in REGION_BBOXES
+        ]
+        if unsupported:
+            return jsonify({
+                'error': f"Unsupported regions: {', '.join(map(str, unsupported))}",
+                'suggestions': f"Supported regions: {', '.join(name.title() for name in REGION_BBOXES)}"
+            }), 400
+        
+        if len(pairs) > MAX_BATCH_PAIRS:
+            return jsonify({'error': f'At most {MAX_BATCH_PAIRS} distinct energy_type/region pairs per batch'}), 400
+        
+        def run(energy_type, region):
+            return agent_system.agent_5_predict_trends(
+                sites=_region_stats(region),
+                energy_type=energy_type,
+                region=region
+            )
+        
+        futures = {
+            f"{energy_type}:{region}": batch_executor.submit(run, energy_type, region)
+            for energy_type, region in pairs
+        }
+        
+        # One failing pair reports its own error rather than failing the batch
+        predictions = {}
+        for key, future in futures.items():
+            try:
+                predictions[key] = future.result()
+            except Exception as e:
+                logger.warning(f"   ⚠️ Batch prediction {key} failed: {e}")
+                predictions[key] = {'error': str(e)}
+        
+        return jsonify({
+            'success': True,
+            'predictions': predictions,
+            'ai_model': PARSER_MODEL
         })
     
     except Exception as e:
-        print(traceback.format_exc())
+        logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
     print("\n TerraLink Backend Starting...")
-    print("🤖 AI Model: Google Gemini Pro")
+    print(f"🤖 AI Models: Google Gemini ({PARSER_MODEL} parser, {NARRATIVE_MODEL} narrative)")
     print("📡 Agents:")
     print("   - Agent 1: Query Parser (Gemini)")
     print("   - Agent 2: Dataset Discovery")
@@ -0,0 +1,16 @@
+# Production server: gunicorn -c gunicorn.conf.py app:app
+#
+# Threaded workers rather than gevent: the Gemini client talks gRPC, which
+# gevent's monkey-patching breaks, and every slow call (Gemini, GEE) already
+# releases the GIL while it waits on the network.
+import os
+
+bind = os.getenv('TERRALINK_BIND', '0.0.0.0:5001')
+worker_class = 'gthread'
+workers = int(os.getenv('TERRALINK_WORKERS', '4'))
+threads = int(os.getenv('TERRALINK_THREADS', '16'))
+
+# Each Gemini call is capped by TERRALINK_GEMINI_TIMEOUT; the headroom covers
+# GEE sampling plus the Agent 1, 4 and 5 calls of one analyze request
+timeout = 120
+keepalive = 5
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+logger = logging.getLogger("terralink.cache")
+
+CACHE_DIR = '/tmp/terralink_llm_cache'
+CACHE_TTL = 24 * 60 * 60  # Cached answers stay fresh for a day
+
+
+class PromptCache:
+    """Content-addressed cache for Gemini (and GEE) responses, keyed by a hash of the prompt (or any key text)"""
+
+    def __init__(self, maxsize=512, ttl=CACHE_TTL, directory=CACHE_DIR):
+        # Set TERRALINK_NO_CACHE=1 to always hit Gemini
+        self.enabled = os.getenv('TERRALINK_NO_CACHE') != '1'
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # In-process LRU of key -> (expires_at, json payload); request threads
+        # share it, so every read-modify-write holds the lock
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        # On-disk cache so warm restarts keep their hits
+        self._disk = None
+        if self.enabled and diskcache is not None:
+            try:
+                self._disk = diskcache.Cache(directory)
+            except Exception as e:
+                logger.warning(f"⚠️  LLM disk cache unavailable: {e}")
+
+    @staticmethod
+    def key(text):
+        """Stable 128-bit digest of the rendered prompt or key text"""
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def get(self, text):
+        """Return a fresh copy of the cached response, or None on miss"""
+        if not self.enabled:
+            return None
+
+        key = self.key(text)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > time.time():
+                    self._memory.move_to_end(key)
+                    return json.loads(payload)
+                del self._memory[key]
+
+        if self._disk is not None:
+            payload, expires_at = self._disk.get(key, expire_time=True)
+            if payload is not None:
+                self._remember(key, payload, expires_at or time.time() + self.ttl)
+                return json.loads(payload)
+
+        return None
+
+    def set(self, text, value):
+        """Store a JSON-serializable response under the hash of its key text"""
+        if not self.enabled:
+            return
+
+        key = self.key(text)
+        payload = json.dumps(value)
+        self._remember(key, payload, time.time() + self.ttl)
+
+        if self._disk is not None:
+            self._disk.set(key, payload, expire=self.ttl)
+
+    def _remember(self, key, payload, expires_at):
+        with self._lock:
+            self._memory[key] = (expires_at, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)